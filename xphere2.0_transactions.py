@@ -4,18 +4,23 @@ import requests
 import pandas as pd
 from datetime import datetime
 import time
+from xphere_sketches import TransactionSketches
+from xphere_index import TransactionIndex
 
 # --- 1. 초기 설정 ---
 now = datetime.now()
 filename = f"transactions_{now.strftime('%Y%m%d_%H%M%S')}.csv"
+sketch_filename = f"tx_sketches_{now.strftime('%Y%m%d_%H%M%S')}.json"
 url = 'https://xp.tamsa.io/xphere/api/v1/tx'
+SKETCH_SAVE_EVERY = 50  # 수집 중에도 근사 통계를 볼 수 있도록 N 페이지마다 스케치 저장
 
-def fetch_transactions_in_batches(existing_tx_ids=None):
+def fetch_transactions_in_batches(existing_tx_ids=None, sketches=None):
     """
     전체 페이지를 스캔하여 트랜잭션 데이터를 수집하는 함수.
     
     :param existing_tx_ids: (set, optional) 이미 수집된 txId 집합. 
                             이 값이 주어지면, 여기에 없는 txId만 수집합니다.
+    :param sketches: (TransactionSketches, optional) 새로 수집된 트랜잭션을 페이지 단위로 반영할 스케치.
     :return: 수집된 트랜잭션 데이터 리스트 (list of dicts)
     """
     if existing_tx_ids is None:
@@ -41,14 +46,19 @@ def fetch_transactions_in_batches(existing_tx_ids=None):
                 print(f"페이지 {page}에서 더 이상 데이터가 없어 {scan_type} 스캔을 종료합니다.")
                 break
 
-            new_found_count = 0
+            new_rows = []
             for tx in rows:
                 tx_id = tx.get('txId')
                 if tx_id not in existing_tx_ids:
-                    collected_transactions.append(tx)
+                    new_rows.append(tx)
                     if is_second_scan: # 2차 스캔일 때만 새 ID를 추가
                         existing_tx_ids.add(tx_id)
-                    new_found_count += 1
+            collected_transactions.extend(new_rows)
+            new_found_count = len(new_rows)
+            if sketches is not None:
+                sketches.update(new_rows)
+                if page % SKETCH_SAVE_EVERY == 0:
+                    sketches.save(sketch_filename)
             
             if is_second_scan:
                 print(f"페이지 {page} 완료 (새로 발견된 누락 데이터: {new_found_count}건)")
@@ -68,9 +78,23 @@ def fetch_transactions_in_batches(existing_tx_ids=None):
     return collected_transactions
 
 
+def update_tx_index(path):
+    """조회 인덱스를 갱신한다. 인덱스는 부가 기능이므로 실패해도 수집은 계속한다."""
+    try:
+        tx_index = TransactionIndex()
+        try:
+            print(f"조회 인덱스 갱신 완료 ({tx_index.update(path)}건 인덱싱)")
+        finally:
+            tx_index.close()
+    except Exception as e:
+        print(f"⚠️ 조회 인덱스 갱신 실패 (수집은 계속 진행합니다): {e}")
+
+
 # --- 2. 1차 전체 스캔 실행 ---
 print("--- 1차 전체 데이터 스캔을 시작합니다. ---")
-initial_transactions = fetch_transactions_in_batches()
+sketches = TransactionSketches()
+initial_transactions = fetch_transactions_in_batches(sketches=sketches)
+sketches.save(sketch_filename)
 seen_tx_ids = {tx['txId'] for tx in initial_transactions} # 2차 스캔을 위한 ID 집합 생성
 
 # --- 3. 1차 수집 데이터를 CSV로 저장 ---
@@ -78,13 +102,16 @@ if initial_transactions:
     df = pd.DataFrame(initial_transactions)
     df.to_csv(filename, index=False, encoding='utf-8-sig')
     print(f"\n✅ 1차 스캔 완료. {len(initial_transactions)}개의 데이터가 '{filename}' 파일에 저장되었습니다.")
+    update_tx_index(filename)
 else:
     print("\n⚠️ 1차 스캔에서 수집된 데이터가 없습니다. 프로그램을 종료합니다.")
     exit() # 데이터가 없으면 종료
 
 # --- 4. 2차 스캔으로 누락된 데이터 찾기 ---
 print(f"\n--- 2차 스캔을 시작합니다. 1차 스캔 동안 추가/변경된 데이터를 확인합니다. ---")
-missing_transactions = fetch_transactions_in_batches(existing_tx_ids=seen_tx_ids)
+missing_transactions = fetch_transactions_in_batches(existing_tx_ids=seen_tx_ids, sketches=sketches)
+sketches.save(sketch_filename)
+print(f"근사 통계 스케치가 '{sketch_filename}' 파일에 저장되었습니다. (확인: python xphere_sketches.py)")
 
 # --- 5. 누락된 데이터를 기존 CSV 파일에 추가 저장 ---
 if missing_transactions:
@@ -94,6 +121,7 @@ if missing_transactions:
     # mode='a' (append)로 파일을 열고, header=False로 헤더 중복 작성을 방지합니다.
     new_df.to_csv(filename, mode='a', header=False, index=False, encoding='utf-8-sig')
     print(f"누락된 데이터가 '{filename}' 파일에 성공적으로 추가되었습니다.")
+    update_tx_index(filename)
     total_records = len(initial_transactions) + len(missing_transactions)
     print(f"최종적으로 총 {total_records}개의 데이터가 저장되었습니다.")
 else:
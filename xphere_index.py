@@ -0,0 +1,328 @@
+# xphere_index.py
+# transactions_*.csv 를 전체 로드하지 않고 조회하기 위한 디스크 인덱스 + 조회 서비스
+#  - txId -> (파일, 바이트 오프셋)
+#  - 지갑 -> 트랜잭션 (시간순 정렬, 상대 지갑/금액 포함)
+#  - 블록 번호 -> 트랜잭션
+# 인덱스는 SQLite 파일(tx_index.db)에 저장되며, 파일별로 마지막 인덱싱 위치를 기억하여
+# 수집기가 CSV에 이어 쓴 부분만 증분 인덱싱한다.
+#
+# 실행 방법:
+#   python xphere_index.py                 -> 인덱스 갱신 후 HTTP 서버 실행 (기본 포트 8050)
+#   python xphere_index.py 9000            -> 포트 지정
+# HTTP 엔드포인트 (JSON 응답):
+#   /tx/<txId>
+#   /wallet/<address>?start=<unix>&end=<unix>&limit=<n>
+#   /wallet/<address>/counterparties?limit=<n>
+#   /block/<number>
+
+import csv
+import io
+import json
+import os
+import sqlite3
+import sys
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from urllib.parse import urlparse, parse_qs, unquote
+from xphere_sketches import to_real
+
+INDEX_FILENAME = 'tx_index.db'
+SCHEMA_VERSION = 3  # 테이블 구조가 바뀌면 올려서 기존 인덱스를 다시 만든다
+BATCH_SIZE = 10000  # 한 트랜잭션(쓰기 잠금)으로 반영할 최대 행 수
+REQUIRED_COLUMNS = ['txId', 'txTime', 'txFrom', 'txTo', 'amount']
+# tx API 응답의 블록 번호 필드명 (API 스키마 문서가 없어 탐사기 관례인 blockNumber로 가정)
+BLOCK_COLUMN = 'blockNumber'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    file_id INTEGER PRIMARY KEY,
+    path TEXT UNIQUE,
+    header TEXT,
+    offset INTEGER,
+    has_block INTEGER
+);
+CREATE TABLE IF NOT EXISTS txs (
+    tx_id TEXT PRIMARY KEY,
+    file_id INTEGER,
+    offset INTEGER,
+    end_offset INTEGER,
+    tx_time INTEGER,
+    block INTEGER
+);
+CREATE INDEX IF NOT EXISTS txs_block ON txs (block, tx_time);
+CREATE TABLE IF NOT EXISTS wallet_txs (
+    wallet TEXT,
+    tx_time INTEGER,
+    tx_id TEXT,
+    counterparty TEXT,
+    direction TEXT,
+    amount REAL,
+    PRIMARY KEY (wallet, tx_id, direction)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS wallet_txs_time ON wallet_txs (wallet, tx_time);
+"""
+
+
+def _to_int(value):
+    try:
+        return int(float(value))
+    except (TypeError, ValueError):
+        return None
+
+
+def _read_record(f):
+    """
+    현재 위치에서 CSV 레코드 하나를 읽는다. 따옴표 안의 줄바꿈이 있으면 여러 줄을 이어 읽는다.
+    :return: (values, 레코드 끝 오프셋). 레코드가 아직 다 쓰이지 않았으면 None (위치는 원래대로 복구).
+    """
+    start = f.tell()
+    data = b''
+    while True:
+        line = f.readline()
+        if not line.endswith(b'\n'):
+            # 수집기가 아직 쓰는 중인 마지막 레코드는 다음 갱신 때 처리
+            f.seek(start)
+            return None
+        data += line
+        if data.count(b'"') % 2 == 0:
+            break
+    values = next(csv.reader(io.StringIO(data.decode('utf-8'), newline='')), [])
+    return values, f.tell()
+
+
+class TransactionIndex:
+    """
+    트랜잭션 CSV 파일에 대한 바이트 오프셋 인덱스.
+    실제 행 데이터는 CSV에 그대로 두고, 조회 시 해당 위치만 읽어 파싱한다.
+    """
+
+    def __init__(self, index_path=INDEX_FILENAME):
+        self.conn = sqlite3.connect(index_path)
+        self.conn.row_factory = sqlite3.Row
+        if self.conn.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+            self.conn.executescript("DROP TABLE IF EXISTS files; DROP TABLE IF EXISTS txs; "
+                                    "DROP TABLE IF EXISTS wallet_txs;")
+            self.conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        self.conn.executescript(SCHEMA)
+        self._headers = {}
+        self._failed = {}  # path -> 실패 당시 (크기, 수정 시각). 파일이 바뀌기 전에는 재시도하지 않음
+
+    def close(self):
+        self.conn.close()
+
+    def _commit_batch(self, path, header, batch_start, batch_end, txs, wallet_txs):
+        """
+        파싱한 한 배치를 파일 오프셋 갱신과 함께 하나의 트랜잭션으로 반영한다.
+        다른 프로세스(수집기/조회 서버)가 먼저 같은 구간을 인덱싱했다면 배치를 버린다.
+        :return: (반영 여부, 파일의 현재 인덱싱 오프셋)
+        """
+        try:
+            self.conn.execute("BEGIN IMMEDIATE")
+            cur = self.conn.execute(
+                "INSERT OR IGNORE INTO files (path, header, offset, has_block) VALUES (?, ?, ?, ?)",
+                (path, json.dumps(header), batch_start, int(BLOCK_COLUMN in header)))
+            if cur.rowcount == 1 and BLOCK_COLUMN not in header:
+                print(f"⚠️ '{path}'에 '{BLOCK_COLUMN}' 컬럼이 없어 블록 번호 조회에서 제외됩니다.")
+            row = self.conn.execute("SELECT file_id, offset FROM files WHERE path = ?", (path,)).fetchone()
+            if row['offset'] != batch_start:
+                self.conn.rollback()
+                return False, row['offset']
+            file_id = row['file_id']
+            self.conn.executemany("INSERT OR REPLACE INTO txs VALUES (?, ?, ?, ?, ?, ?)",
+                                  [(tx[0], file_id) + tx[1:] for tx in txs])
+            self.conn.executemany("INSERT OR REPLACE INTO wallet_txs VALUES (?, ?, ?, ?, ?, ?)", wallet_txs)
+            self.conn.execute("UPDATE files SET offset = ? WHERE file_id = ?", (batch_end, file_id))
+            self.conn.commit()
+            return True, batch_end
+        except BaseException:
+            self.conn.rollback()
+            raise
+
+    def update(self, path):
+        """
+        CSV 파일에서 아직 인덱싱되지 않은 부분(마지막 오프셋 이후)만 인덱싱한다.
+        BATCH_SIZE 행 단위로 커밋하므로 큰 파일도 메모리와 쓰기 잠금을 오래 잡지 않는다.
+        :return: 새로 인덱싱된 트랜잭션 수
+        """
+        path = os.path.abspath(path)
+        row = self.conn.execute("SELECT header, offset FROM files WHERE path = ?", (path,)).fetchone()
+        if row is not None and os.path.getsize(path) <= row['offset']:
+            return 0
+
+        indexed = 0
+        with open(path, 'rb') as f:
+            if row is None:
+                header_line = f.readline()
+                if not header_line.endswith(b'\n'):
+                    return 0  # 헤더가 아직 다 쓰이지 않음
+                header = next(csv.reader([header_line.decode('utf-8-sig')]))
+                missing = [c for c in REQUIRED_COLUMNS if c not in header]
+                if missing:
+                    raise ValueError(f"'{path}'에 필수 컬럼이 없습니다: {missing}")
+            else:
+                header = json.loads(row['header'])
+                f.seek(row['offset'])
+
+            col = {name: i for i, name in enumerate(header)}
+            while True:
+                batch_start = f.tell()
+                txs, wallet_txs = [], []
+                while len(txs) < BATCH_SIZE:
+                    offset = f.tell()
+                    record = _read_record(f)
+                    if record is None:
+                        break
+                    values, end_offset = record
+                    if len(values) != len(header):
+                        print(f"⚠️ '{path}' 오프셋 {offset}: 컬럼 수가 헤더와 달라 건너뜁니다.")
+                        continue
+                    tx_id = values[col['txId']]
+                    tx_time = _to_int(values[col['txTime']])
+                    tx_from, tx_to = values[col['txFrom']], values[col['txTo']]
+                    amount = to_real(values[col['amount']])
+                    block = _to_int(values[col[BLOCK_COLUMN]]) if BLOCK_COLUMN in col else None
+                    txs.append((tx_id, offset, end_offset, tx_time, block))
+                    if tx_from:
+                        wallet_txs.append((tx_from, tx_time, tx_id, tx_to, 'out', amount))
+                    if tx_to:
+                        wallet_txs.append((tx_to, tx_time, tx_id, tx_from, 'in', amount))
+                if f.tell() == batch_start:
+                    break
+                committed, offset = self._commit_batch(path, header, batch_start, f.tell(), txs, wallet_txs)
+                if committed:
+                    indexed += len(txs)
+                else:
+                    f.seek(offset)
+        return indexed
+
+    def refresh(self, directory='.'):
+        """
+        디렉터리의 모든 transactions_*.csv 를 증분 인덱싱한다.
+        인덱싱할 수 없는 파일은 경고만 출력하고 나머지 파일은 계속 처리한다.
+        """
+        files = sorted(f for f in os.listdir(directory) if f.startswith('transactions_') and f.endswith('.csv'))
+        indexed = 0
+        for f in files:
+            path = os.path.join(directory, f)
+            stat = os.stat(path)
+            signature = (stat.st_size, stat.st_mtime)
+            if self._failed.get(path) == signature:
+                continue
+            try:
+                indexed += self.update(path)
+                self._failed.pop(path, None)
+            except (ValueError, sqlite3.Error, OSError) as e:
+                self._failed[path] = signature
+                print(f"⚠️ '{f}' 인덱싱 실패 (파일이 변경될 때까지 건너뜁니다): {e}")
+        return indexed
+
+    def _read_row(self, file_id, offset, end_offset):
+        if file_id not in self._headers:
+            r = self.conn.execute("SELECT path, header FROM files WHERE file_id = ?", (file_id,)).fetchone()
+            self._headers[file_id] = (r['path'], json.loads(r['header']))
+        path, header = self._headers[file_id]
+        with open(path, 'rb') as f:
+            f.seek(offset)
+            data = f.read(end_offset - offset)
+        values = next(csv.reader(io.StringIO(data.decode('utf-8'), newline='')))
+        return dict(zip(header, values))
+
+    def _read_rows(self, rows):
+        return [self._read_row(r['file_id'], r['offset'], r['end_offset']) for r in rows]
+
+    def get_transaction(self, tx_id):
+        r = self.conn.execute("SELECT file_id, offset, end_offset FROM txs WHERE tx_id = ?", (tx_id,)).fetchone()
+        return self._read_row(r['file_id'], r['offset'], r['end_offset']) if r else None
+
+    def wallet_history(self, wallet, start=None, end=None, limit=100):
+        """
+        지갑의 트랜잭션 이력을 시간순으로 반환한다.
+        :param start, end: (int, optional) txTime(unix 초) 범위 (포함). txTime이 없는 트랜잭션은 범위를 지정하지 않을 때만 포함된다.
+        """
+        conditions, params = ["w.wallet = ?"], [wallet]
+        if start is not None:
+            conditions.append("w.tx_time >= ?")
+            params.append(start)
+        if end is not None:
+            conditions.append("w.tx_time <= ?")
+            params.append(end)
+        rows = self.conn.execute(
+            "SELECT DISTINCT t.file_id, t.offset, t.end_offset, w.tx_time FROM wallet_txs w "
+            "JOIN txs t ON t.tx_id = w.tx_id "
+            f"WHERE {' AND '.join(conditions)} ORDER BY w.tx_time LIMIT ?", params + [limit]).fetchall()
+        return self._read_rows(rows)
+
+    def counterparties(self, wallet, limit=20):
+        """
+        지갑과 거래한 상대 지갑별 횟수/금액 합계 (거래 횟수 내림차순).
+        자기 자신에게 보낸 트랜잭션은 out/in 두 행으로 저장되므로 txId 기준으로 센다.
+        """
+        rows = self.conn.execute(
+            "SELECT counterparty, COUNT(DISTINCT tx_id) AS tx_count, "
+            "SUM(CASE WHEN direction = 'out' THEN amount ELSE 0 END) AS sent, "
+            "SUM(CASE WHEN direction = 'in' THEN amount ELSE 0 END) AS received "
+            "FROM wallet_txs WHERE wallet = ? GROUP BY counterparty ORDER BY tx_count DESC LIMIT ?",
+            (wallet, limit)).fetchall()
+        return [dict(r) for r in rows]
+
+    def block_transactions(self, block):
+        """
+        블록에 포함된 트랜잭션을 반환한다.
+        :raises LookupError: 인덱싱된 파일 중 블록 번호 컬럼이 있는 파일이 없을 때
+        """
+        if self.conn.execute("SELECT 1 FROM files WHERE has_block = 1 LIMIT 1").fetchone() is None:
+            raise LookupError(f"인덱싱된 트랜잭션 파일에 '{BLOCK_COLUMN}' 컬럼이 없어 블록 번호로 조회할 수 없습니다.")
+        rows = self.conn.execute(
+            "SELECT file_id, offset, end_offset FROM txs WHERE block = ? ORDER BY tx_time", (block,)).fetchall()
+        return self._read_rows(rows)
+
+
+def make_handler(index):
+    class QueryHandler(BaseHTTPRequestHandler):
+        def _send(self, status, body):
+            data = json.dumps(body, ensure_ascii=False).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json; charset=utf-8')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            parts = [unquote(p) for p in url.path.strip('/').split('/') if p]
+            query = {k: v[0] for k, v in parse_qs(url.query).items()}
+            try:
+                index.refresh()
+                if len(parts) == 2 and parts[0] == 'tx':
+                    tx = index.get_transaction(parts[1])
+                    return self._send(200, tx) if tx else self._send(404, {'error': '트랜잭션을 찾을 수 없습니다.'})
+                if len(parts) == 2 and parts[0] == 'wallet':
+                    return self._send(200, index.wallet_history(
+                        parts[1], _to_int(query.get('start')), _to_int(query.get('end')),
+                        _to_int(query.get('limit')) or 100))
+                if len(parts) == 3 and parts[0] == 'wallet' and parts[2] == 'counterparties':
+                    return self._send(200, index.counterparties(parts[1], _to_int(query.get('limit')) or 20))
+                if len(parts) == 2 and parts[0] == 'block' and _to_int(parts[1]) is not None:
+                    return self._send(200, index.block_transactions(_to_int(parts[1])))
+                self._send(404, {'error': '지원하지 않는 경로입니다.'})
+            except LookupError as e:
+                self._send(404, {'error': str(e)})
+            except Exception as e:
+                self._send(500, {'error': str(e)})
+
+    return QueryHandler
+
+
+if __name__ == "__main__":
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 8050
+    index = TransactionIndex()
+    print("트랜잭션 인덱스를 갱신합니다...")
+    print(f"새로 인덱싱된 트랜잭션: {index.refresh()}건")
+    server = HTTPServer(('127.0.0.1', port), make_handler(index))
+    print(f"조회 서버 실행 중: http://127.0.0.1:{port}/  (종료: Ctrl+C)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n조회 서버를 종료합니다.")
+    finally:
+        server.server_close()
+        index.close()
@@ -0,0 +1,376 @@
+# xphere_sketches.py
+# 수집기 페이지 스트림을 바로 받아 근사 통계를 유지하는 스케치 모음
+#  - HyperLogLog : 고유 발신/수신/전체 지갑 수
+#  - Space-Saving : 발신/수신/메소드 상위 Top-N (횟수, 금액)
+#  - t-digest : 금액/수수료 분포 (분위수)
+# 모든 스케치는 병합(merge) 가능하며 JSON 파일로 저장/복원된다.
+#
+# 실행 방법:
+#   python xphere_sketches.py                      -> 최신 tx_sketches_*.json 요약 출력
+#   python xphere_sketches.py a.json b.json ...    -> 여러 샤드를 병합하여 요약 출력
+
+import base64
+import hashlib
+import json
+import math
+import os
+import sys
+
+DIVISOR = 10**18
+
+
+def _hash64(value):
+    """문자열 값을 64비트 정수 해시로 변환."""
+    digest = hashlib.blake2b(str(value).encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, 'big')
+
+
+def to_real(value):
+    """
+    wei 단위 값을 XP로 변환. pd.to_numeric(errors='coerce')처럼
+    '2e+18', '2000000000000000000.0' 형식도 허용하고, 변환할 수 없으면 None.
+    JSON 실수(float)는 int()로 잘리지 않도록 실수 변환만 사용한다.
+    """
+    if isinstance(value, (int, str)):
+        try:
+            return int(value) / DIVISOR
+        except ValueError:
+            pass
+    try:
+        real = float(value) / DIVISOR
+    except (TypeError, ValueError):
+        return None
+    return real if math.isfinite(real) else None
+
+
+class HyperLogLog:
+    """
+    고유 원소 수를 근사하는 HyperLogLog. 메모리는 2^p 바이트로 고정된다.
+    p=14 기준 표준 오차는 약 0.8%.
+    """
+
+    def __init__(self, p=14):
+        self.p = p
+        self.m = 1 << p
+        self.registers = bytearray(self.m)
+
+    def add(self, value):
+        x = _hash64(value)
+        idx = x >> (64 - self.p)
+        w = x & ((1 << (64 - self.p)) - 1)
+        rank = (64 - self.p) - w.bit_length() + 1
+        if rank > self.registers[idx]:
+            self.registers[idx] = rank
+
+    def merge(self, other):
+        if other.p != self.p:
+            raise ValueError(f"HyperLogLog 정밀도가 다릅니다: {self.p} != {other.p}")
+        self.registers = bytearray(max(a, b) for a, b in zip(self.registers, other.registers))
+        return self
+
+    def count(self):
+        m = self.m
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / sum(2.0 ** -r for r in self.registers)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * m and zeros:
+            # 작은 범위 보정 (linear counting)
+            estimate = m * math.log(m / zeros)
+        return int(round(estimate))
+
+    def to_dict(self):
+        return {'p': self.p, 'registers': base64.b64encode(bytes(self.registers)).decode('ascii')}
+
+    @classmethod
+    def from_dict(cls, d):
+        hll = cls(d['p'])
+        hll.registers = bytearray(base64.b64decode(d['registers']))
+        return hll
+
+
+class SpaceSaving:
+    """
+    상위 빈도(또는 가중치 합) 항목을 추적하는 Space-Saving 요약.
+    항목 수가 capacity의 2배를 넘으면 상위 capacity개만 남기고,
+    잘려나간 최대값(floor)을 이후 새 항목의 초기값으로 사용한다.
+    따라서 추정값은 항상 실제값 이상이며, 오차는 error 필드로 제한된다.
+    """
+
+    def __init__(self, capacity=1000):
+        self.capacity = capacity
+        self.floor = 0.0
+        self.counters = {}  # key -> [count, error]
+
+    def add(self, key, weight=1):
+        entry = self.counters.get(key)
+        if entry is not None:
+            entry[0] += weight
+        else:
+            self.counters[key] = [self.floor + weight, self.floor]
+            if len(self.counters) > 2 * self.capacity:
+                self._prune()
+
+    def _prune(self):
+        items = sorted(self.counters.items(), key=lambda kv: kv[1][0], reverse=True)
+        kept, dropped = items[:self.capacity], items[self.capacity:]
+        if dropped:
+            self.floor = max(self.floor, dropped[0][1][0])
+        self.counters = dict(kept)
+
+    def merge(self, other):
+        merged = {}
+        for key in set(self.counters) | set(other.counters):
+            a = self.counters.get(key, [self.floor, self.floor])
+            b = other.counters.get(key, [other.floor, other.floor])
+            merged[key] = [a[0] + b[0], a[1] + b[1]]
+        self.counters = merged
+        self.floor = self.floor + other.floor
+        self.capacity = max(self.capacity, other.capacity)
+        if len(self.counters) > self.capacity:
+            self._prune()
+        return self
+
+    def top(self, n=10):
+        """
+        :return: [(key, 추정값, 최대 오차), ...] (추정값 내림차순)
+        """
+        items = sorted(self.counters.items(), key=lambda kv: kv[1][0], reverse=True)[:n]
+        return [(key, count, error) for key, (count, error) in items]
+
+    def to_dict(self):
+        return {'capacity': self.capacity, 'floor': self.floor, 'counters': self.counters}
+
+    @classmethod
+    def from_dict(cls, d):
+        ss = cls(d['capacity'])
+        ss.floor = d['floor']
+        ss.counters = {k: list(v) for k, v in d['counters'].items()}
+        return ss
+
+
+class TDigest:
+    """
+    분위수(중앙값, p99 등)를 근사하는 merging t-digest.
+    centroid 수는 대략 delta 이하로 제한된다.
+    """
+
+    def __init__(self, delta=200):
+        self.delta = delta
+        self.centroids = []  # [[mean, weight], ...] (mean 오름차순)
+        self.buffer = []
+        self.total = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def add(self, value, weight=1):
+        self.buffer.append([value, weight])
+        self.total += weight
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+        if len(self.buffer) >= 10 * self.delta:
+            self._compress()
+
+    def _k(self, q):
+        return self.delta / (2 * math.pi) * math.asin(2 * q - 1)
+
+    def _k_inv(self, k):
+        return (math.sin(k * 2 * math.pi / self.delta) + 1) / 2
+
+    def _compress(self):
+        points = sorted(self.centroids + self.buffer, key=lambda c: c[0])
+        self.buffer = []
+        if not points:
+            return
+        merged = [list(points[0])]
+        cumulative = 0.0
+        q_limit = self._k_inv(self._k(0.0) + 1) * self.total
+        for mean, weight in points[1:]:
+            current = merged[-1]
+            if cumulative + current[1] + weight <= q_limit:
+                new_weight = current[1] + weight
+                current[0] += (mean - current[0]) * weight / new_weight
+                current[1] = new_weight
+            else:
+                cumulative += current[1]
+                q_limit = self._k_inv(self._k(min(cumulative / self.total, 1.0)) + 1) * self.total
+                merged.append([mean, weight])
+        self.centroids = merged
+
+    def merge(self, other):
+        self.buffer.extend([list(c) for c in other.centroids + other.buffer])
+        self.total += other.total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self._compress()
+        return self
+
+    def quantile(self, q):
+        self._compress()
+        if not self.centroids:
+            return None
+        if len(self.centroids) == 1:
+            return self.centroids[0][0]
+        target = q * self.total
+        # 양 끝은 실제 최소/최대값과 보간
+        prev_mid, prev_mean = 0.0, self.min
+        cumulative = 0.0
+        for mean, weight in self.centroids:
+            mid = cumulative + weight / 2
+            if target < mid:
+                if mid == prev_mid:
+                    return mean
+                return prev_mean + (mean - prev_mean) * (target - prev_mid) / (mid - prev_mid)
+            prev_mid, prev_mean = mid, mean
+            cumulative += weight
+        if self.total == prev_mid:
+            return self.max
+        return prev_mean + (self.max - prev_mean) * (target - prev_mid) / (self.total - prev_mid)
+
+    def to_dict(self):
+        self._compress()
+        # 비어 있으면 min/max가 ±inf 이므로, 표준 JSON으로 저장되도록 None으로 기록
+        empty = not self.centroids
+        return {'delta': self.delta, 'total': self.total,
+                'min': None if empty else self.min, 'max': None if empty else self.max,
+                'centroids': self.centroids}
+
+    @classmethod
+    def from_dict(cls, d):
+        td = cls(d['delta'])
+        td.total = d['total']
+        td.min = d['min'] if d['min'] is not None else math.inf
+        td.max = d['max'] if d['max'] is not None else -math.inf
+        td.centroids = [list(c) for c in d['centroids']]
+        return td
+
+
+class TransactionSketches:
+    """
+    트랜잭션 페이지(rows)를 받아 분석 보고서용 근사 통계를 유지하는 묶음.
+    generate_analysis_report의 Top 10 / nunique / 고유 지갑 수에 대응한다.
+    """
+
+    def __init__(self, capacity=1000):
+        self.tx_count = 0
+        self.unique_senders = HyperLogLog()
+        self.unique_receivers = HyperLogLog()
+        self.unique_wallets = HyperLogLog()
+        self.top_senders = SpaceSaving(capacity)
+        self.top_receivers = SpaceSaving(capacity)
+        self.whale_senders = SpaceSaving(capacity)
+        self.whale_receivers = SpaceSaving(capacity)
+        self.methods = SpaceSaving(capacity)
+        self.amounts = TDigest()
+        self.fees = TDigest()
+
+    def update(self, rows):
+        """
+        수집기의 한 페이지 분량 트랜잭션 리스트를 반영한다.
+        보고서 전처리와 동일하게 금액/발신/수신이 없는 트랜잭션은 제외한다.
+        """
+        for tx in rows:
+            tx_from, tx_to = tx.get('txFrom'), tx.get('txTo')
+            amount = to_real(tx.get('amount'))
+            if amount is None or not tx_from or not tx_to:
+                continue
+            self.tx_count += 1
+            self.unique_senders.add(tx_from)
+            self.unique_receivers.add(tx_to)
+            self.unique_wallets.add(tx_from)
+            self.unique_wallets.add(tx_to)
+            self.top_senders.add(tx_from)
+            self.top_receivers.add(tx_to)
+            self.whale_senders.add(tx_from, amount)
+            self.whale_receivers.add(tx_to, amount)
+            # value_counts()는 NaN(CSV의 빈 값)을 제외하므로 메소드가 없으면 집계하지 않음
+            method = tx.get('method')
+            if method is not None and method != '':
+                self.methods.add(str(method))
+            self.amounts.add(amount)
+            fee = to_real(tx.get('txFee'))
+            if fee is not None:
+                self.fees.add(fee)
+
+    def merge(self, other):
+        self.tx_count += other.tx_count
+        for name, sketch in vars(self).items():
+            if name != 'tx_count':
+                sketch.merge(getattr(other, name))
+        return self
+
+    def to_dict(self):
+        d = {name: sketch.to_dict() for name, sketch in vars(self).items() if name != 'tx_count'}
+        d['tx_count'] = self.tx_count
+        return d
+
+    @classmethod
+    def from_dict(cls, d):
+        sk = cls()
+        sk.tx_count = d['tx_count']
+        for name, sketch in vars(sk).items():
+            if name != 'tx_count':
+                setattr(sk, name, type(sketch).from_dict(d[name]))
+        return sk
+
+    def save(self, path):
+        """임시 파일에 쓴 뒤 교체하여, 수집 도중 읽어도 깨진 파일이 보이지 않게 한다."""
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f, allow_nan=False)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'r', encoding='utf-8') as f:
+            return cls.from_dict(json.load(f))
+
+    def summary(self):
+        return {
+            'tx_count': self.tx_count,
+            'unique_senders': self.unique_senders.count(),
+            'unique_receivers': self.unique_receivers.count(),
+            'total_unique_wallets': self.unique_wallets.count(),
+            'top_senders_count': self.top_senders.top(10),
+            'top_receivers_count': self.top_receivers.top(10),
+            'whale_senders_amount': self.whale_senders.top(10),
+            'whale_receivers_amount': self.whale_receivers.top(10),
+            'method_counts': self.methods.top(15),
+            'amount_quantiles': {q: self.amounts.quantile(q) for q in (0.5, 0.9, 0.99)},
+            'fee_quantiles': {q: self.fees.quantile(q) for q in (0.5, 0.9, 0.99)},
+        }
+
+
+def print_summary(sketches):
+    s = sketches.summary()
+    print(f"\n[근사 통계] 트랜잭션 {s['tx_count']}건 기준")
+    print(f"고유 발신 지갑 수: ~{s['unique_senders']}")
+    print(f"고유 수신 지갑 수: ~{s['unique_receivers']}")
+    print(f"총 고유 참여 지갑 수: ~{s['total_unique_wallets']}")
+    for key, title in [('top_senders_count', '거래 횟수 기준 Top 10 발신 지갑'),
+                       ('top_receivers_count', '거래 횟수 기준 Top 10 수신 지갑'),
+                       ('whale_senders_amount', '거래 금액 기준 Top 10 발신 지갑 (XP)'),
+                       ('whale_receivers_amount', '거래 금액 기준 Top 10 수신 지갑 (XP)'),
+                       ('method_counts', '상위 호출 메소드 (Top 15)')]:
+        print(f"\n{title}")
+        for item, value, error in s[key]:
+            print(f"  {item}: {value:,.2f} (오차 ≤ {error:,.2f})")
+    for key, title in [('amount_quantiles', '금액 분포 (XP)'), ('fee_quantiles', '수수료 분포 (XP)')]:
+        quantiles = ', '.join(f"p{int(q * 100)}={v:.6g}" for q, v in s[key].items() if v is not None)
+        print(f"\n{title}: {quantiles or '데이터 없음'}")
+
+
+if __name__ == "__main__":
+    paths = sys.argv[1:]
+    if not paths:
+        files = [f for f in os.listdir('.') if f.startswith('tx_sketches_') and f.endswith('.json')]
+        if not files:
+            print("스케치 파일(tx_sketches_*.json)이 없습니다. 먼저 트랜잭션을 수집하세요.")
+            exit()
+        files.sort(reverse=True)
+        paths = [files[0]]
+    merged = None
+    for path in paths:
+        print(f"스케치 로드: {path}")
+        sk = TransactionSketches.load(path)
+        merged = sk if merged is None else merged.merge(sk)
+    print_summary(merged)